@@ -204,10 +204,12 @@ def update():
     if timer_frames <= 0:
         game_over = True
         elapsed_sec = TIMER_SEC
+        now = datetime.now()
         entry = {
             "name": PLAYER_NAME,
             "score": float(energy_total),
-            "date": datetime.now().date().isoformat(),
+            "date": now.date().isoformat(),
+            "time": now.strftime("%H:%M:%S"),
             "energy_kj": float(energy_total),
             "duration_sec": int(elapsed_sec),
             "avg_power_w": None,
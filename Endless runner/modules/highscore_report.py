@@ -0,0 +1,279 @@
+# highscore_report.py
+# Usage: python -m modules.highscore_report report highscore.json "highscore_archive/*.jsonl.gz"
+import argparse
+import csv
+import glob
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.highscores import DEFAULT_FILE, _normalize
+
+STREAM_CHUNK = 64 * 1024
+ENERGY_BIN_KJ = 250.0
+SPEED_BIN = 25.0
+TOPN_RIDERS = 5
+UNKNOWN_HOUR = "unknown"  # rides saved before the time field existed
+# Rides still in a store: its recent history plus rides waiting to be archived
+RIDE_KEYS = ("history", "pending_archive")
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+class ReportInputError(Exception):
+    """An input file could not be read as rides; the message names the file."""
+
+def _iter_json_rides(f, keys=RIDE_KEYS):
+    """Yield entries of a store's ride arrays (or a top-level array) without loading the file.
+
+    A store's arrays named in keys are streamed in file order. Raises
+    ValueError if the file holds none of them.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(STREAM_CHUNK)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def array_items():
+        nonlocal pos
+        while True:
+            skip_ws()
+            if pos >= len(buf):
+                return
+            ch = buf[pos]
+            if ch == "]":
+                pos += 1
+                return
+            if ch == ",":
+                pos += 1
+                continue
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                # A number at the end of the buffer may be cut short; re-read.
+                fill()
+                continue
+            pos = end
+            yield obj
+
+    skip_ws()
+    if buf[pos:pos + 1] == "[":
+        # Old flat list format: [ {name, score, date}, ... ]
+        pos += 1
+        yield from array_items()
+        return
+
+    # Find each `"<key>"` followed by `:` and `[`
+    markers = {f'"{k}"': k for k in keys}
+    longest = max(len(m) for m in markers)
+    found = False
+    while markers:
+        hits = [(buf.find(m, pos), m) for m in markers]
+        hits = [(i, m) for i, m in hits if i >= 0]
+        if not hits:
+            if eof:
+                break
+            pos = max(pos, len(buf) - longest)
+            fill()
+            continue
+        i, marker = min(hits)
+        pos = i + len(marker)
+        skip_ws()
+        if buf[pos:pos + 1] != ":":
+            continue
+        pos += 1
+        skip_ws()
+        if buf[pos:pos + 1] == "[":
+            pos += 1
+            del markers[marker]
+            found = True
+            yield from array_items()
+
+    if not found:
+        raise ValueError("no history array found")
+
+def iter_entries(path):
+    """Stream normalized rides from a store (.json) or journal (.jsonl[.gz]).
+
+    Raises ReportInputError naming the file if it cannot be read or parsed.
+    """
+    try:
+        with _open_text(path) as f:
+            if ".jsonl" in os.path.basename(path):
+                rows = (json.loads(line) for line in f if line.strip())
+            else:
+                rows = _iter_json_rides(f)
+            for n, e in enumerate(rows, 1):
+                if not isinstance(e, dict):
+                    raise ValueError(f"ride {n} is not an object")
+                yield _normalize(e)
+    except (ValueError, TypeError, OSError, EOFError) as exc:
+        raise ReportInputError(f"{path}: {exc}") from None
+
+class Report:
+    """Single-pass aggregates; memory grows with days/bins, not with rides."""
+
+    def __init__(self, energy_bin=ENERGY_BIN_KJ, speed_bin=SPEED_BIN, top_n=TOPN_RIDERS):
+        self.energy_bin = energy_bin
+        self.speed_bin = speed_bin
+        self.top_n = top_n
+        self.rides = 0
+        self.per_hour = {}       # (date, hour) -> rides
+        self.energy_hist = {}    # bin start -> rides
+        self.speed_hist = {}     # bin start -> rides
+        self.top_riders = {}     # date -> [(score, name)], best score per rider
+
+    def add(self, e):
+        self.rides += 1
+        hour = e["time"][:2] if e.get("time") else UNKNOWN_HOUR
+        key = (e["date"], hour)
+        self.per_hour[key] = self.per_hour.get(key, 0) + 1
+
+        b = (e["energy_kj"] // self.energy_bin) * self.energy_bin
+        self.energy_hist[b] = self.energy_hist.get(b, 0) + 1
+        if e["avg_speed"] is not None:
+            b = (float(e["avg_speed"]) // self.speed_bin) * self.speed_bin
+            self.speed_hist[b] = self.speed_hist.get(b, 0) + 1
+
+        self._offer(self.top_riders.setdefault(e["date"], []), e["score"], e["name"])
+
+    def _offer(self, top, score, name):
+        for i, (s, n) in enumerate(top):
+            if n == name:
+                if score > s:
+                    top[i] = (score, name)
+                return
+        if len(top) < self.top_n:
+            top.append((score, name))
+            return
+        lo = min(range(len(top)), key=lambda i: top[i][0])
+        if score > top[lo][0]:
+            top[lo] = (score, name)
+
+    def merge(self, other):
+        self.rides += other.rides
+        for mine, theirs in ((self.per_hour, other.per_hour),
+                             (self.energy_hist, other.energy_hist),
+                             (self.speed_hist, other.speed_hist)):
+            for k, v in theirs.items():
+                mine[k] = mine.get(k, 0) + v
+        for day, top in other.top_riders.items():
+            mine = self.top_riders.setdefault(day, [])
+            for score, name in top:
+                self._offer(mine, score, name)
+        return self
+
+    def write_csv(self, out_dir):
+        """One column-per-field CSV per report; returns the written paths."""
+        os.makedirs(out_dir, exist_ok=True)
+        tables = {
+            "rides_per_hour.csv": (["date", "hour", "rides"],
+                                   [(d, h, c) for (d, h), c in sorted(self.per_hour.items())]),
+            "energy_hist.csv": (["energy_kj_from", "energy_kj_to", "rides"],
+                                [(b, b + self.energy_bin, c) for b, c in sorted(self.energy_hist.items())]),
+            "speed_hist.csv": (["avg_speed_from", "avg_speed_to", "rides"],
+                               [(b, b + self.speed_bin, c) for b, c in sorted(self.speed_hist.items())]),
+            "top_riders.csv": (["date", "rank", "name", "score"],
+                               [(d, r, n, s) for d in sorted(self.top_riders)
+                                for r, (s, n) in enumerate(sorted(self.top_riders[d], reverse=True), 1)]),
+        }
+        paths = []
+        for fname, (header, rows) in tables.items():
+            path = os.path.join(out_dir, fname)
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(header)
+                w.writerows(rows)
+            paths.append(path)
+        return paths
+
+def report_file(path, energy_bin=ENERGY_BIN_KJ, speed_bin=SPEED_BIN, top_n=TOPN_RIDERS):
+    rep = Report(energy_bin=energy_bin, speed_bin=speed_bin, top_n=top_n)
+    for e in iter_entries(path):
+        rep.add(e)
+    return rep
+
+def build_report(paths, jobs=1, **kwargs):
+    """Aggregate several files (e.g. monthly archives), optionally in parallel."""
+    total = Report(**kwargs)
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(report_file, p, **kwargs) for p in paths]
+            for fut in futures:
+                total.merge(fut.result())
+    else:
+        for p in paths:
+            total.merge(report_file(p, **kwargs))
+    return total
+
+def _positive(kind):
+    def parse(text):
+        try:
+            value = kind(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid number: {text!r}")
+        if value <= 0:
+            raise argparse.ArgumentTypeError(f"must be greater than 0: {text!r}")
+        return value
+    return parse
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="highscore_report", description="High score reports.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("report", help="stream rides and write CSV reports")
+    rp.add_argument("inputs", nargs="*", default=[DEFAULT_FILE],
+                    help="store .json or journal .jsonl[.gz] files (globs allowed)")
+    rp.add_argument("-o", "--out", default="reports", help="output directory")
+    rp.add_argument("-j", "--jobs", type=_positive(int), default=1, help="parallel worker processes")
+    rp.add_argument("--energy-bin", type=_positive(float), default=ENERGY_BIN_KJ)
+    rp.add_argument("--speed-bin", type=_positive(float), default=SPEED_BIN)
+    rp.add_argument("--top", type=_positive(int), default=TOPN_RIDERS)
+    args = parser.parse_args(argv)
+
+    # Overlapping globs must not count a file twice
+    paths, seen = [], set()
+    for pattern in args.inputs:
+        for p in sorted(glob.glob(pattern)) or [pattern]:
+            real = os.path.realpath(p)
+            if real not in seen:
+                seen.add(real)
+                paths.append(p)
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        parser.error("input not found: " + ", ".join(missing))
+
+    try:
+        rep = build_report(paths, jobs=args.jobs, energy_bin=args.energy_bin,
+                           speed_bin=args.speed_bin, top_n=args.top)
+    except ReportInputError as exc:
+        parser.error(str(exc))
+    for path in rep.write_csv(args.out):
+        print(path)
+    print(f"{rep.rides} rides from {len(paths)} file(s)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
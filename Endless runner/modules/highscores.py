@@ -1,6 +1,9 @@
 # highscores.py
+import gzip
 import json
-from datetime import datetime, date
+import os
+import uuid
+from datetime import datetime, date, timedelta
 
 DEFAULT_FILE = "highscore.json"
 TOPN_DAILY = 30
@@ -8,8 +11,34 @@ TOPN_MONTHLY = 5
 TOPN_YEARLY = 5
 TOPN_ALLTIME = 5
 
+# Retention: raw rides older than RETAIN_DAYS leave "history" and go to
+# gzip'd archives (one file per month and batch); day rollups older than ROLLUP_DAYS are dropped
+# (month rollups already hold their totals). Moved rides wait in
+# "pending_archive" (saved with the store) until their archive append is done.
+STORE_VERSION = 2
+RETAIN_DAYS = 30
+ROLLUP_DAYS = 366
+ARCHIVE_DIR = "highscore_archive"
+
 def _empty_store():
-    return {"history": [], "daily": {}, "monthly": {}, "yearly": {}, "alltime": []}
+    return {
+        "version": STORE_VERSION,
+        "history": [], "daily": {}, "monthly": {}, "yearly": {}, "alltime": [],
+        "rollups": {"days": {}, "months": {}},
+        "pending_archive": [], "retained_on": "",
+    }
+
+def _normalize(entry):
+    return {
+        "name": entry.get("name", "Unknown"),
+        "score": float(entry.get("score", 0.0)),
+        "date": entry.get("date", date.today().isoformat()),
+        "time": entry.get("time", None),
+        "energy_kj": float(entry.get("energy_kj", entry.get("score", 0.0))),
+        "duration_sec": int(entry.get("duration_sec", 0)),
+        "avg_power_w": entry.get("avg_power_w", None),
+        "avg_speed": entry.get("avg_speed", None),
+    }
 
 def _asc_insert_cap(lst, entry, key="score", cap=5):
     lst.append(entry)
@@ -24,13 +53,18 @@ def _asc_insert_cap(lst, entry, key="score", cap=5):
         i = (i - extras) if kept else None
     return i
 
-def load_store(file=DEFAULT_FILE):
+def load_store(file=DEFAULT_FILE, now=None, retain_days=RETAIN_DAYS):
     try:
         with open(file, "r") as f:
             data = json.load(f)
     except Exception:
         return _empty_store()
 
+    store = _parse_store(data)
+    retain_and_save(store, file=file, now=now, retain_days=retain_days)
+    return store
+
+def _parse_store(data):
     # Migrate old single-value format: {"high_score": X}
     if isinstance(data, dict) and "high_score" in data:
         entry = {
@@ -50,42 +84,44 @@ def load_store(file=DEFAULT_FILE):
     if isinstance(data, list):
         store = _empty_store()
         for e in data:
-            norm = {
-                "name": e.get("name", "Unknown"),
-                "score": float(e.get("score", 0.0)),
-                "date": e.get("date", date.today().isoformat()),
-                "energy_kj": float(e.get("energy_kj", e.get("score", 0.0))),
-                "duration_sec": int(e.get("duration_sec", 0)),
-                "avg_power_w": e.get("avg_power_w", None),
-                "avg_speed": e.get("avg_speed", None),
-            }
-            add_score(store, norm, persist=False)
+            add_score(store, _normalize(e), persist=False)
         return store
 
-    # Structured store → normalize by rebuilding buckets from history
-    if isinstance(data, dict):
+    if not isinstance(data, dict):
+        return _empty_store()
+
+    # Retained store: buckets and rollups cover rides no longer in history,
+    # so they are taken as saved instead of rebuilt.
+    if data.get("version") == STORE_VERSION:
         store = _empty_store()
-        for e in data.get("history", []):
-            norm = {
-                "name": e.get("name", "Unknown"),
-                "score": float(e.get("score", 0.0)),
-                "date": e.get("date", date.today().isoformat()),
-                "energy_kj": float(e.get("energy_kj", e.get("score", 0.0))),
-                "duration_sec": int(e.get("duration_sec", 0)),
-                "avg_power_w": e.get("avg_power_w", None),
-                "avg_speed": e.get("avg_speed", None),
-            }
-            add_score(store, norm, persist=False)
+        store["history"] = [_normalize(e) for e in data.get("history", [])]
+        for key in ("daily", "monthly", "yearly"):
+            store[key] = {k: [_normalize(e) for e in v] for k, v in data.get(key, {}).items()}
+        store["alltime"] = [_normalize(e) for e in data.get("alltime", [])]
+        rollups = data.get("rollups", {})
+        store["rollups"]["days"] = dict(rollups.get("days", {}))
+        store["rollups"]["months"] = dict(rollups.get("months", {}))
+        # Kept as saved: each row carries its archive "batch" id
+        store["pending_archive"] = list(data.get("pending_archive", []))
+        store["retained_on"] = data.get("retained_on", "")
         return store
 
-    return _empty_store()
+    # Structured store → normalize by rebuilding buckets from history
+    store = _empty_store()
+    for e in data.get("history", []):
+        add_score(store, _normalize(e), persist=False)
+    return store
 
 def save_store(store, file=DEFAULT_FILE):
+    """Write via a temp file + os.replace so a crash never leaves half a store."""
+    tmp = file + ".tmp"
     try:
-        with open(file, "w") as f:
+        with open(tmp, "w") as f:
             json.dump(store, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, file)
+        return True
     except Exception:
-        pass
+        return False
 
 def _bucket_keys(datestr):
     return datestr, datestr[:7], datestr[:4]  # day, month, year
@@ -95,15 +131,7 @@ def add_score(store, entry, persist=True, file=DEFAULT_FILE):
     return store
 
 def add_score_with_ranks(store, entry, persist=True, file=DEFAULT_FILE):
-    e = {
-        "name": entry.get("name", "Unknown"),
-        "score": float(entry.get("score", 0.0)),
-        "date": entry.get("date", date.today().isoformat()),
-        "energy_kj": float(entry.get("energy_kj", entry.get("score", 0.0))),
-        "duration_sec": int(entry.get("duration_sec", 0)),
-        "avg_power_w": entry.get("avg_power_w", None),
-        "avg_speed": entry.get("avg_speed", None),
-    }
+    e = _normalize(entry)
 
     store["history"].append(e)
 
@@ -122,6 +150,9 @@ def add_score_with_ranks(store, entry, persist=True, file=DEFAULT_FILE):
     ai = _asc_insert_cap(alltime, e, key="score", cap=TOPN_ALLTIME)
 
     if persist:
+        # A long-running session trims history once per new ride date
+        if store.get("retained_on", "") < e["date"]:
+            retain_and_save(store, file=file, now=e["date"])
         save_store(store, file=file)
 
     def idx_to_rank(idx, bucket):
@@ -135,6 +166,137 @@ def add_score_with_ranks(store, entry, persist=True, file=DEFAULT_FILE):
     }
     return store, ranks
 
+def _rollup_add(rollup, e):
+    """Fold one ride into a {count, energy_kj, best_score, avg_speed} aggregate."""
+    rollup["count"] = rollup.get("count", 0) + 1
+    rollup["energy_kj"] = rollup.get("energy_kj", 0.0) + e["energy_kj"]
+    rollup["best_score"] = max(rollup.get("best_score", e["score"]), e["score"])
+    if e["avg_speed"] is not None:
+        n = rollup.get("speed_count", 0) + 1
+        avg = rollup.get("avg_speed") or 0.0
+        rollup["speed_count"] = n
+        rollup["avg_speed"] = avg + (float(e["avg_speed"]) - avg) / n
+    else:
+        rollup.setdefault("speed_count", 0)
+        rollup.setdefault("avg_speed", None)
+
+def archive_path(datestr, batch, file=DEFAULT_FILE):
+    """Compressed line-delimited archive holding one batch of a month's old rides."""
+    base = os.path.dirname(os.path.abspath(file))
+    return os.path.join(base, ARCHIVE_DIR, f"{datestr[:7]}.{batch}.jsonl.gz")
+
+def archive_files(month, file=DEFAULT_FILE):
+    """All archive files for a YYYY-MM month, oldest name first."""
+    folder = os.path.join(os.path.dirname(os.path.abspath(file)), ARCHIVE_DIR)
+    if not os.path.isdir(folder):
+        return []
+    prefix = month + "."
+    return [os.path.join(folder, n) for n in sorted(os.listdir(folder))
+            if n.startswith(prefix) and n.endswith(".jsonl.gz")]
+
+def flush_archive(store, file=DEFAULT_FILE):
+    """Write pending rides to their archives and clear them.
+
+    Each (month, batch) group gets its own file, written to a temp file and
+    moved into place, so a crash never leaves a partial archive behind. A
+    group whose file already exists (an earlier flush that died before the
+    store was saved) is not written again. Raises OSError on failure.
+    """
+    groups = {}
+    for e in store.get("pending_archive", []):
+        groups.setdefault((e["date"][:7], e.get("batch", "")), []).append(e)
+    for (month, batch), rows in sorted(groups.items()):
+        path = archive_path(month, batch, file=file)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for e in rows:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+    store["pending_archive"] = []
+
+def apply_retention(store, now=None, retain_days=RETAIN_DAYS):
+    """Move rides older than retain_days out of history into rollups.
+
+    Moved rides go to store["pending_archive"]; nothing is written to disk
+    here (see retain_and_save). Monthly/yearly/all-time top lists are left
+    untouched, so top_month, top_year and top_alltime still see archived
+    rides. Returns True if anything changed.
+    """
+    now = now or datetime.now()
+    cutoff = (now.date() - timedelta(days=retain_days)).isoformat()
+    rollup_cutoff = (now.date() - timedelta(days=ROLLUP_DAYS)).isoformat()
+    store["retained_on"] = max(store.get("retained_on", ""), now.date().isoformat())
+
+    kept, old = [], []
+    for e in store["history"]:
+        (old if e["date"] < cutoff else kept).append(e)
+
+    rollups = store.setdefault("rollups", {"days": {}, "months": {}})
+    days = rollups.setdefault("days", {})
+    months = rollups.setdefault("months", {})
+    for e in old:
+        _rollup_add(days.setdefault(e["date"], {}), e)
+        _rollup_add(months.setdefault(e["date"][:7], {}), e)
+
+    stale_daily = [k for k in store["daily"] if k < cutoff]
+    stale_days = [k for k in days if k < rollup_cutoff]
+    if not old and not stale_daily and not stale_days:
+        return False
+
+    if old:
+        batch = uuid.uuid4().hex
+        store.setdefault("pending_archive", []).extend(dict(e, batch=batch) for e in old)
+        store["history"] = kept
+    for k in stale_daily:
+        del store["daily"][k]
+    for k in stale_days:
+        del days[k]
+    return True
+
+def retain_and_save(store, file=DEFAULT_FILE, now=None, retain_days=RETAIN_DAYS):
+    """Apply retention and persist it if anything moved; never raises.
+
+    now may be a datetime or an ISO date string (a ride's date). The store
+    (trimmed history, rollups, pending rides) is saved atomically before the
+    archive files are written, then saved again once pending is cleared. A
+    crash or failure at any step leaves rides in exactly one of history,
+    pending_archive or the archive, and rollups are never counted twice.
+    """
+    try:
+        if isinstance(now, str):
+            now = datetime.fromisoformat(now)
+        changed = apply_retention(store, now=now, retain_days=retain_days)
+        if not (changed or store.get("pending_archive")):
+            return True
+        if not save_store(store, file=file):
+            return False
+        if store.get("pending_archive"):
+            flush_archive(store, file=file)
+            return save_store(store, file=file)
+        return True
+    except Exception as exc:
+        print(f"highscores: retention skipped ({exc})")
+        return False
+
+def rollup_day(store, day):
+    """Aggregate for a day: archived rollup merged with rides still in history."""
+    rollup = dict(store.get("rollups", {}).get("days", {}).get(day, {}))
+    for e in store["history"]:
+        if e["date"] == day:
+            _rollup_add(rollup, e)
+    return rollup
+
+def rollup_month(store, month):
+    """Aggregate for a YYYY-MM month, including rides still in history."""
+    rollup = dict(store.get("rollups", {}).get("months", {}).get(month, {}))
+    for e in store["history"]:
+        if e["date"][:7] == month:
+            _rollup_add(rollup, e)
+    return rollup
+
 def today_key(now=None):
     now = now or datetime.now()
     return now.date().isoformat()
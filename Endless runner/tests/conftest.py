@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Tests import the game's modules package the same way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def ride(name, score, day, time=None, speed=100.0):
+    """A raw ride entry as main.py saves it."""
+    return {"name": name, "score": score, "date": day, "time": time,
+            "energy_kj": score, "duration_sec": 60, "avg_power_w": None, "avg_speed": speed}
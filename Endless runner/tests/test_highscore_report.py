@@ -0,0 +1,146 @@
+import gzip
+import io
+import json
+import random
+
+import pytest
+
+from conftest import ride
+from modules import highscore_report as hr
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 7, 64])
+def test_iter_json_rides_matches_json_load(monkeypatch, chunk):
+    monkeypatch.setattr(hr, "STREAM_CHUNK", chunk)
+    rng = random.Random(chunk)
+    names = ["a", "history", 'x"]history', "pending_archive", 'y"pending_archive', "ä"]
+
+    def rows():
+        return [{"name": rng.choice(names),
+                 "score": rng.choice([0, 1.5, -2e-3, 1e10, rng.random() * 1e4]),
+                 "date": "2026-01-%02d" % rng.randint(1, 28),
+                 "avg_speed": rng.choice([None, 12.5, 123456789])}
+                for _ in range(rng.randint(0, 15))]
+
+    for _ in range(20):
+        data = {"version": 2, "history": rows(), "daily": {"x": [{"name": "history"}]},
+                "pending_archive": rows(), "retained_on": ""}
+        text = json.dumps(data, indent=rng.choice([None, 2]))
+        expected = json.loads(text)
+        assert list(hr._iter_json_rides(io.StringIO(text))) == expected["history"] + expected["pending_archive"]
+
+
+def test_iter_json_rides_reads_flat_list(monkeypatch):
+    monkeypatch.setattr(hr, "STREAM_CHUNK", 3)
+    rows = [{"name": "a", "score": 1}, {"name": "b", "score": 2}]
+    assert list(hr._iter_json_rides(io.StringIO(json.dumps(rows)))) == rows
+
+
+def test_iter_json_rides_without_history_raises():
+    with pytest.raises(ValueError, match="no history array"):
+        list(hr._iter_json_rides(io.StringIO('{"high_score": 10}')))
+
+
+def test_top_riders_keep_best_ride_per_rider():
+    rep = hr.Report(top_n=2)
+    for name, score in [("a", 5), ("a", 9), ("b", 7), ("c", 1), ("a", 3)]:
+        rep.add(ride(name, score, "2026-03-01"))
+    assert sorted(rep.top_riders["2026-03-01"], reverse=True) == [(9, "a"), (7, "b")]
+
+    other = hr.Report(top_n=2)
+    for name, score in [("b", 12), ("c", 8), ("a", 2)]:
+        other.add(ride(name, score, "2026-03-01"))
+    rep.merge(other)
+    assert sorted(rep.top_riders["2026-03-01"], reverse=True) == [(12, "b"), (9, "a")]
+    assert rep.rides == 8
+
+
+def test_missing_time_is_reported_as_unknown_hour():
+    rep = hr.Report()
+    rep.add(ride("a", 1, "2026-03-01"))
+    rep.add(ride("b", 1, "2026-03-01", time="14:05:00"))
+    assert rep.per_hour == {("2026-03-01", hr.UNKNOWN_HOUR): 1, ("2026-03-01", "14"): 1}
+
+
+def _write_inputs(tmp_path):
+    store = tmp_path / "highscore.json"
+    store.write_text(json.dumps({"version": 2, "history": [
+        ride("a", 300.0, "2026-03-02", "10:00:00"), ride("b", 120.0, "2026-03-02", "11:30:00")],
+        "pending_archive": [dict(ride("d", 80.0, "2026-02-01", "08:00:00"), batch="b1")]}))
+    archive = tmp_path / "highscore_archive"
+    archive.mkdir()
+    for month, rows in [("2026-01", [ride("a", 50.0, "2026-01-04"), ride("c", 700.0, "2026-01-04", speed=None)]),
+                        ("2026-02", [ride("b", 260.0, "2026-02-11", "09:15:00")])]:
+        with gzip.open(archive / (month + ".jsonl.gz"), "wt", encoding="utf-8") as f:
+            for r in rows:
+                f.write(json.dumps(r) + "\n")
+    return [str(store), str(archive / "*.jsonl.gz")]
+
+
+def _read_outputs(out_dir):
+    return {p.name: p.read_text() for p in sorted(out_dir.iterdir())}
+
+
+def test_main_serial_and_parallel_match(tmp_path, capsys):
+    inputs = _write_inputs(tmp_path)
+    assert hr.main(["report", *inputs, "-o", str(tmp_path / "one"), "-j", "1"]) == 0
+    assert hr.main(["report", *inputs, "-o", str(tmp_path / "two"), "-j", "2"]) == 0
+    assert "6 rides from 3 file(s)" in capsys.readouterr().out
+
+    one = _read_outputs(tmp_path / "one")
+    assert one == _read_outputs(tmp_path / "two")
+    assert "2026-01-04,unknown,2" in one["rides_per_hour.csv"]
+    assert "2026-01-04,1,c,700.0" in one["top_riders.csv"]
+    assert "2026-02-01,08,1" in one["rides_per_hour.csv"]
+
+
+def test_main_counts_overlapping_inputs_once(tmp_path, capsys):
+    store, archives = _write_inputs(tmp_path)
+    (one_archive,) = [p for p in (tmp_path / "highscore_archive").iterdir() if p.name.startswith("2026-01")]
+    out = str(tmp_path / "out")
+    assert hr.main(["report", store, archives, str(one_archive), store, "-o", out]) == 0
+    assert "6 rides from 3 file(s)" in capsys.readouterr().out
+
+
+def test_main_rejects_missing_input(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        hr.main(["report", str(tmp_path / "nope.json"), "-o", str(tmp_path / "out")])
+    assert "input not found" in capsys.readouterr().err
+
+
+def test_main_rejects_store_without_history(tmp_path, capsys):
+    path = tmp_path / "old.json"
+    path.write_text('{"high_score": 10}')
+    with pytest.raises(SystemExit):
+        hr.main(["report", str(path), "-o", str(tmp_path / "out")])
+    assert "no history array found" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
+
+
+def _gz_bytes(text):
+    return gzip.compress(text.encode("utf-8"))
+
+
+@pytest.mark.parametrize("name, content, message", [
+    ("cut.jsonl.gz", _gz_bytes('{"name": "a"}\n' * 50)[:-12], "cut.jsonl.gz"),
+    ("bad.jsonl.gz", b"not gzip at all", "bad.jsonl.gz"),
+    ("ints.json", b'{"history": [1, 2]}', "ride 1 is not an object"),
+    ("broken.json", b'{"history": [{"name": "a"}, {"na', "broken.json"),
+])
+def test_main_reports_unreadable_inputs(tmp_path, capsys, name, content, message):
+    path = tmp_path / name
+    path.write_bytes(content)
+    with pytest.raises(SystemExit):
+        hr.main(["report", str(path), "-o", str(tmp_path / "out")])
+    err = capsys.readouterr().err
+    assert message in err
+    assert str(path) in err
+
+
+@pytest.mark.parametrize("flag", ["--top", "--energy-bin", "--speed-bin", "--jobs"])
+@pytest.mark.parametrize("value", ["0", "-1", "x"])
+def test_main_rejects_non_positive_options(tmp_path, capsys, flag, value):
+    inputs = _write_inputs(tmp_path)
+    with pytest.raises(SystemExit):
+        hr.main(["report", *inputs, "-o", str(tmp_path / "out"), flag, value])
+    assert flag in capsys.readouterr().err
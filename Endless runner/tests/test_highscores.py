@@ -0,0 +1,171 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+from conftest import ride
+from modules import highscores as hs
+
+NOW = datetime(2026, 3, 20)
+
+
+def write_v1(path, rides):
+    store = hs._empty_store()
+    for r in rides:
+        hs.add_score(store, r, persist=False)
+    data = {k: store[k] for k in ("history", "daily", "monthly", "yearly", "alltime")}
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def read_archive(month, store_path):
+    rows = []
+    for path in hs.archive_files(month, store_path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            rows.extend(json.loads(line) for line in f)
+    return rows
+
+
+def test_v1_store_migrates_to_v2(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("a", 10.0, "2026-03-19"), ride("b", 20.0, "2026-03-19")])
+
+    store = hs.load_store(path, now=NOW)
+    assert store["version"] == hs.STORE_VERSION
+    assert [e["name"] for e in hs.top_alltime(store)] == ["b", "a"]
+
+    hs.save_store(store, path)
+    with open(path) as f:
+        assert json.load(f)["version"] == hs.STORE_VERSION
+
+
+def test_retention_moves_old_rides_to_archive_and_rollups(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("old", 50.0, "2026-01-05", speed=10.0),
+                    ride("old2", 30.0, "2026-01-05", speed=30.0),
+                    ride("new", 5.0, "2026-03-19")])
+
+    store = hs.load_store(path, now=NOW)
+    assert [e["name"] for e in store["history"]] == ["new"]
+    assert "2026-01-05" not in store["daily"]
+    assert store["pending_archive"] == []
+
+    rows = read_archive("2026-01", path)
+    assert [r["name"] for r in rows] == ["old", "old2"]
+
+    day = store["rollups"]["days"]["2026-01-05"]
+    assert day["count"] == 2
+    assert day["energy_kj"] == 80.0
+    assert day["best_score"] == 50.0
+    assert day["avg_speed"] == 20.0
+    assert store["rollups"]["months"]["2026-01"]["count"] == 2
+
+
+def test_reload_is_idempotent(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("old", 50.0, "2026-01-05"), ride("new", 5.0, "2026-03-19")])
+
+    first = hs.load_store(path, now=NOW)
+    second = hs.load_store(path, now=NOW)
+    assert second["rollups"] == first["rollups"]
+    assert len(read_archive("2026-01", path)) == 1
+
+
+def test_interrupted_flush_is_not_archived_twice(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("old", 50.0, "2026-01-05"), ride("new", 5.0, "2026-03-19")])
+
+    # Simulate a crash after the archive append but before the final save
+    store = hs.load_store(path, now=datetime(2026, 1, 6))
+    assert hs.apply_retention(store, now=NOW)
+    hs.save_store(store, path)
+    pending = [dict(e) for e in store["pending_archive"]]
+    hs.flush_archive(store, path)
+    store["pending_archive"] = pending
+    hs.save_store(store, path)
+
+    reloaded = hs.load_store(path, now=NOW)
+    assert reloaded["pending_archive"] == []
+    assert reloaded["rollups"]["months"]["2026-01"]["count"] == 1
+    assert len(read_archive("2026-01", path)) == 1
+
+
+def test_top_lists_keep_archived_rides(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("champ", 99.0, "2026-03-01"), ride("new", 5.0, "2026-03-19")])
+
+    store = hs.load_store(path, now=datetime(2026, 4, 10))
+    assert all(e["name"] != "champ" for e in store["history"])
+    assert hs.top_month(store, now=datetime(2026, 3, 25))[0]["name"] == "champ"
+    assert hs.top_year(store, now=NOW)[0]["name"] == "champ"
+    assert hs.top_alltime(store)[0]["name"] == "champ"
+
+    again = hs.load_store(path, now=datetime(2026, 4, 10))
+    assert hs.top_alltime(again)[0]["name"] == "champ"
+
+
+def test_rollup_month_merges_history_without_double_counting(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("old", 10.0, "2026-03-01"), ride("new", 20.0, "2026-03-19")])
+
+    store = hs.load_store(path, now=datetime(2026, 4, 5))
+    assert [e["name"] for e in store["history"]] == ["new"]
+    month = hs.rollup_month(store, "2026-03")
+    assert month["count"] == 2
+    assert month["energy_kj"] == 30.0
+    assert month["best_score"] == 20.0
+    assert store["rollups"]["months"]["2026-03"]["count"] == 1
+
+
+def test_load_survives_unwritable_archive(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("old", 50.0, "2026-01-05"), ride("new", 5.0, "2026-03-19")])
+    # A file where the archive directory should be
+    (tmp_path / hs.ARCHIVE_DIR).write_text("")
+
+    store = hs.load_store(path, now=NOW)
+    assert [e["name"] for e in store["history"]] == ["new"]
+    assert [e["name"] for e in store["pending_archive"]] == ["old"]
+
+    os.remove(tmp_path / hs.ARCHIVE_DIR)
+    store = hs.load_store(path, now=NOW)
+    assert store["pending_archive"] == []
+    assert store["rollups"]["months"]["2026-01"]["count"] == 1
+    assert len(read_archive("2026-01", path)) == 1
+
+
+def test_add_score_applies_retention_on_new_day(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    store = hs._empty_store()
+    hs.add_score(store, ride("first", 10.0, "2026-01-05"), file=path)
+    hs.add_score(store, ride("later", 20.0, "2026-03-19"), file=path)
+
+    assert [e["name"] for e in store["history"]] == ["later"]
+    assert store["retained_on"] == "2026-03-19"
+    assert len(read_archive("2026-01", path)) == 1
+
+
+def test_truncated_archive_does_not_block_later_flushes(tmp_path, capsys):
+    path = str(tmp_path / "highscore.json")
+    write_v1(path, [ride("old", 50.0, "2026-01-05"), ride("new", 5.0, "2026-03-19")])
+    store = hs.load_store(path, now=NOW)
+    (damaged,) = hs.archive_files("2026-01", path)
+    with open(damaged, "rb") as f:
+        head = f.read()
+    with open(damaged, "wb") as f:
+        f.write(head[:len(head) // 2])
+
+    hs.add_score(store, ride("late", 7.0, "2026-01-07"), file=path)
+    store = hs.load_store(path, now=NOW)
+    assert store["pending_archive"] == []
+    assert "retention skipped" not in capsys.readouterr().out
+    assert len(hs.archive_files("2026-01", path)) == 2
+    assert store["rollups"]["months"]["2026-01"]["count"] == 2
+
+
+def test_add_score_with_non_iso_date_does_not_raise(tmp_path):
+    path = str(tmp_path / "highscore.json")
+    store = hs._empty_store()
+    store, ranks = hs.add_score_with_ranks(store, ride("odd", 10.0, "27/02/2026"), file=path)
+    assert ranks["alltime_rank"] == 1
+    assert [e["name"] for e in hs.load_store(path)["history"]] == ["odd"]